@@ -1,17 +1,25 @@
 import streamlit as st
 from streamlit_option_menu import option_menu
-import json, random, base64, urllib.parse, os, hashlib, toml
-import pandas as pd
+import json, random, base64, urllib.parse, os, hashlib, math, toml
 from pathlib import Path
 from datetime import datetime
 
 import pyrebase
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core import exceptions as gexc
+
+from auth_session import AuthSession
+from tabular_preview import open_preview
+from image_assets import image_html
+from write_journal import PermanentWriteError, get_journal
+from recommend import get_recommender
+from rate_limit import get_limiter
 
 # Init Firebase Auth (Pyrebase) 
 firebase = pyrebase.initialize_app(st.secrets["firebase_config"])
 auth = firebase.auth()
+PROJECT_ID = st.secrets["firebase_config"]["projectId"]
 
 try:
     firebase_admin.get_app()
@@ -24,6 +32,37 @@ except ValueError:
     firebase_admin.initialize_app(cred)
 db = firestore.client()
 
+def commit_writes(entries):
+    # Replayed after a crash or failed commit, so every operation is idempotent
+    batch = db.batch()
+    for e in entries:
+        if e.kind == "post":
+            batch.set(db.collection("posts").document(e.target), e.payload)
+        elif e.kind == "reply":
+            # update() fails on a deleted parent post instead of creating a stub
+            batch.update(db.collection("posts").document(e.target),
+                         {"replies": firestore.ArrayUnion([e.payload])})
+        elif e.kind == "favorites":
+            batch.set(db.collection("favorites").document(e.target), e.payload)
+    try:
+        batch.commit()
+    except (gexc.NotFound, gexc.InvalidArgument) as err:
+        # A rejected entry, not an outage: the journal splits the batch to find it
+        e = entries[0]
+        if (len(entries) == 1 and isinstance(err, gexc.NotFound) and e.kind == "reply"
+                and journal.pending("post", e.target)):
+            raise   # the parent post is itself still waiting in the journal
+        raise PermanentWriteError(str(err)) from err
+
+journal = get_journal(commit_writes)
+limiter = get_limiter()
+
+def allow_write(uid: str, action: str) -> bool:
+    decision = limiter.acquire(uid, action)
+    if not decision.allowed:
+        st.warning(f"Չափազանց շատ հարցումներ: Խնդրում ենք կրկին փորձել {math.ceil(decision.retry_after)} վայրկյանից:")
+    return decision.allowed
+
 def get_user_count():
     from firebase_admin import auth as admin_auth
     page = admin_auth.list_users()
@@ -37,13 +76,16 @@ def quote_id(quote: dict) -> str:
     return hashlib.sha1((quote["author"] + "|" + quote["text"]).encode()).hexdigest()
 
 def get_favorites_for_user(uid: str) -> set[str]:
+    pending = journal.pending("favorites", uid)
+    if pending:
+        return set(pending[-1].payload["quote_ids"])
     doc = db.collection("favorites").document(uid).get()
     return set(doc.to_dict().get("quote_ids", [])) if doc.exists else set()
 
 def save_favorites_for_user(uid: str, favs: set[str]):
-    db.collection("favorites").document(uid).set({"quote_ids": list(favs)})
+    journal.enqueue("favorites", uid, {"quote_ids": sorted(favs)}, supersede=True, owner=uid)
 
-def DisplayQuoteCard(quote: dict, user_uid: str, favorites: set[str]):
+def DisplayQuoteCard(quote: dict, user_uid: str, favorites: set[str], key_prefix: str = ""):
     qid = quote_id(quote)
     is_fav = (qid in favorites)
 
@@ -63,12 +105,12 @@ def DisplayQuoteCard(quote: dict, user_uid: str, favorites: set[str]):
 
     # Add or Remove button
     if is_fav:
-        if st.button("Հեռացնել հավանածներից", key=f"rm_{qid}"):
+        if st.button("Հեռացնել հավանածներից", key=f"{key_prefix}rm_{qid}") and allow_write(user_uid, "favorites"):
             favorites.remove(qid)
             save_favorites_for_user(user_uid, favorites)
             st.rerun()
     else:
-        if st.button("Հավանել", key=f"add_{qid}"):
+        if st.button("Հավանել", key=f"{key_prefix}add_{qid}") and allow_write(user_uid, "favorites"):
             favorites.add(qid)
             save_favorites_for_user(user_uid, favorites)
             st.rerun()
@@ -78,18 +120,39 @@ def get_posts():
     docs = db.collection("posts") \
              .order_by("time", direction=firestore.Query.DESCENDING) \
              .stream()
-    return [doc.to_dict() for doc in docs]
-
-def add_post(post, reply_to_id=None):
+    posts = {str(p["id"]): p for p in (doc.to_dict() for doc in docs)}
+    # Journaled writes show up before Firestore has them
+    for e in journal.pending("post"):
+        posts.setdefault(e.target, e.payload)
+    for e in journal.pending("reply"):
+        post = posts.get(e.target)
+        if post is not None and e.payload not in post.setdefault("replies", []):
+            post["replies"].append(e.payload)
+    return sorted(posts.values(), key=lambda p: p["time"], reverse=True)
+
+def add_post(post, uid, reply_to_id=None):
     if reply_to_id:
-        ref = db.collection("posts").document(str(reply_to_id))
-        doc = ref.get()
-        if doc.exists:
-            replies = doc.to_dict().get("replies", [])
-            replies.append(post)
-            ref.update({"replies": replies})
+        journal.enqueue("reply", str(reply_to_id), post, owner=uid)
     else:
-        db.collection("posts").document(str(post["id"])).set(post)
+        journal.enqueue("post", str(post["id"]), post, owner=uid)
+
+def WriteStatus(uid: str):
+    # Only the author hears about their own writes
+    if journal.failing(uid):
+        st.warning("Ձեր որոշ գրառումներ դեռ չեն ուղարկվել: Կփորձենք կրկին:")
+    dead = journal.dead_letters(uid)
+    if dead:
+        st.error("Ձեր հետևյալ գրառումները հնարավոր չեղավ հրապարակել:")
+        for e, _ in dead:
+            if e.kind == "post":
+                st.markdown(f"- **{e.payload['title']}**")
+            elif e.kind == "reply":
+                st.markdown(f"- 💬 {e.payload['content']}")
+            else:
+                st.markdown("- Հավանածների ցանկի փոփոխություն")
+        if st.button("Հասկանալի է", key="dismiss_dead"):
+            journal.dismiss_dead([e.key for e, _ in dead])
+            st.rerun()
 
 
 # --- 4) Authentication UI ---
@@ -100,6 +163,9 @@ def LoginUI():
     if st.button("Մուտք գործել"):
         try:
             user = auth.sign_in_with_email_and_password(email, pwd)
+            session = AuthSession(user, PROJECT_ID, auth.refresh)
+            session.start()
+            st.session_state.auth = session
             st.session_state.user = user
             st.success("Դուք մուտք գործեցիք:")
         except Exception as e:
@@ -121,8 +187,20 @@ def RegisterUI():
                 st.error("Գրանցվելիս տեղի ունեցավ սխալ:")
                 # st.error("Registration failed: " + str(e))
 
+def current_user():
+    # Claims are verified locally once per ID token; the session refreshes itself
+    session = st.session_state.get("auth")
+    if session is None or not session.is_valid():
+        if session is not None:
+            session.stop()
+        st.session_state.pop("auth", None)
+        st.session_state.pop("user", None)
+        return None
+    st.session_state.user = session.user
+    return st.session_state.user
+
 def RequireLogin():
-    if "user" not in st.session_state:
+    if current_user() is None:
         st.markdown("<h5 >Ունե՞ք հաշիվ:</h5>", unsafe_allow_html=True)
         choice = st.radio("", ["Մուտք", "Գրանցում"], key="auth_choice")
         
@@ -223,6 +301,24 @@ def VideoCard(title, url):
             """
     st.markdown(card_html, unsafe_allow_html=True)
 
+PREVIEW_PAGE_SIZE = 100
+
+def TablePreview(name, path_obj):
+    try:
+        table = open_preview(path_obj)
+    except Exception as e:
+        st.error("Ֆայլի նախադիտումը հնարավոր չէ:")
+        # st.error("Preview failed: " + str(e))
+        return
+    st.caption(f"Տողեր: {table.row_count:,} | Սյունակներ: {len(table.columns)}")
+    columns = st.multiselect("Սյունակներ", table.columns, default=table.columns, key=f"cols_{name}")
+    last_page = max((table.row_count - 1) // PREVIEW_PAGE_SIZE, 0)
+    page = st.number_input("Էջ", min_value=0, max_value=last_page, value=0, step=1, key=f"page_{name}")
+    # Only the visible window is read from the memory-mapped cache
+    st.dataframe(table.window(page * PREVIEW_PAGE_SIZE, PREVIEW_PAGE_SIZE, columns))
+    with st.expander("Վիճակագրություն"):
+        st.dataframe(table.stats_frame())
+
 # 5) Main app
 def main():
     with st.sidebar:
@@ -393,7 +489,7 @@ def main():
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            st.image("resources/Georgi_pic.jpg", width=150)
+            st.markdown(image_html("resources/Georgi_pic.jpg", 150), unsafe_allow_html=True)
             st.markdown(
                 """
                 **Գեորգի Գունդակչյան**  
@@ -404,7 +500,7 @@ def main():
             )
 
         with col2:
-            st.image("resources/Hayk_pic.jpg", width=150)
+            st.markdown(image_html("resources/Hayk_pic.jpg", 150), unsafe_allow_html=True)
             st.markdown(
                 """
                 **Հայկ Ալեքյան**  
@@ -415,7 +511,7 @@ def main():
             )
 
         with col3:
-            st.image("resources/Karo_pic.jpg", width=175)
+            st.markdown(image_html("resources/Karo_pic.jpg", 175), unsafe_allow_html=True)
             st.markdown(
                 """
                 **Կարո Խաչատրյան**  
@@ -435,16 +531,21 @@ def main():
         RequireLogin()
 
         user_email = st.session_state.user["email"]
+        user_uid = st.session_state.user["localId"]
 
         name = user_email.split("@")[0]  
         st.title(f"Մուտք գործեցիք որպես {name}:")
 
+        WriteStatus(user_uid)
+
         title = st.text_input("📝 Վերնագիր")
         content = st.text_area("💬 Բովանդակություն")
 
 
         if st.button("Հրապարակել գրառումը"):
-            if title and content:
+            if not (title and content):
+                st.error("Խնդրում ենք լրացնել և վերնագիրը, և բովանդակությունը:")
+            elif allow_write(user_uid, "post"):
                 post = {
                     "id": int(datetime.now().timestamp()*1000),
                     "name": name,
@@ -452,10 +553,8 @@ def main():
                     "content": content,
                     "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 }
-                add_post(post)
+                add_post(post, user_uid)
                 st.success("Հրապարակված է:")
-            else:
-                st.error("Խնդրում ենք լրացնել և վերնագիրը, և բովանդակությունը:")
 
         st.markdown("<div style='height:20px;'></div>", unsafe_allow_html=True)  # Vertical space
         st.subheader("📚 Բոլոր հրապարակումները")
@@ -496,13 +595,13 @@ def main():
             # 👇 Moved inside the loop
             reply_content = st.text_input(f"Պատասխանել {post['name']}-ին", key=f"reply_{post['id']}")
             if st.button("Պատասխանել", key=f"reply_btn_{post['id']}"):
-                if name and reply_content:
+                if name and reply_content and allow_write(user_uid, "reply"):
                     reply = {
                         "name": name,
                         "content": reply_content,
                         "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                     }
-                    add_post(reply, reply_to_id=post["id"])
+                    add_post(reply, user_uid, reply_to_id=post["id"])
                     st.success("✅ Պատասխանը հաջողությամբ հրապարակվել է։")
 
 
@@ -511,7 +610,7 @@ def main():
     elif page == "Մտքեր": 
         st.title("Հայտնի խոսքեր և մտքեր")
 
-        if "user" not in st.session_state:
+        if current_user() is None:
             st.error("Խնդրում ենք մուտք գործել կայքեջ:")
             st.stop()
         user_uid = st.session_state.user["localId"]
@@ -526,6 +625,8 @@ def main():
         with col2:
             show_favs = st.checkbox("Իմ հավանածները")
 
+        WriteStatus(user_uid)
+
         # Fetch current favorites once
         favorites = get_favorites_for_user(user_uid)
 
@@ -543,6 +644,15 @@ def main():
         for q in filtered:
             DisplayQuoteCard(q, user_uid, favorites)
 
+        # "More like this", scored against the centroid of the user's favorites
+        if favorites:
+            suggestions = get_recommender("quotes.json", quote_id).recommend(favorites, k=5)
+            if suggestions:
+                st.markdown("---")
+                st.subheader("✨ Ձեզ կարող է դուր գալ")
+                for q in suggestions:
+                    DisplayQuoteCard(q, user_uid, favorites, key_prefix="rec_")
+
 
     # Տեսադարան
     elif page == "Տեսադարան":
@@ -655,14 +765,11 @@ def main():
                     # Show preview if flagged
                     if st.session_state[f"view_{name}"]:
                         with st.expander(f"Նախադիտում: {name}", expanded=True):
-                            if ext == '.csv':
-                                df = pd.read_csv(path_obj)
-                                st.dataframe(df)
-                            elif ext in ['.xlsx', '.xls']:
-                                df = pd.read_excel(path_obj)
-                                st.dataframe(df)
+                            if ext in ['.csv', '.xlsx', '.xls']:
+                                TablePreview(name, path_obj)
                             elif ext in ['.png', '.jpg', '.jpeg']:
-                                st.image(str(path_obj), caption=name)
+                                st.markdown(image_html(path_obj, 800, alt=name), unsafe_allow_html=True)
+                                st.caption(name)
                             elif ext == '.pdf':
                                 pdf_bytes = path_obj.read_bytes()
                                 b64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
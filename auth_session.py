@@ -0,0 +1,248 @@
+import base64, json, re, threading, time
+from typing import Callable
+
+import requests
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+
+# Firebase ID tokens are RS256 JWTs signed by this service account
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+DEFAULT_MAX_AGE = 3600      # used when the key endpoint sends no Cache-Control
+MIN_REFETCH_INTERVAL = 60   # don't hammer the endpoint on unknown key ids
+CLOCK_SKEW = 60
+REFRESH_MARGIN = 300        # refresh this many seconds before the token expires
+RETRY_DELAY = 30
+IDLE_TIMEOUT = 600          # stop background refreshes after this long without use
+
+
+class TokenError(Exception):
+    pass
+
+
+class TokenExpired(TokenError):
+    pass
+
+
+def fetch_google_certs(url: str = GOOGLE_CERTS_URL) -> tuple[dict[str, str], int]:
+    """Returns ({kid: PEM certificate}, max-age in seconds)."""
+    resp = requests.get(url, timeout=10)
+    resp.raise_for_status()
+    match = re.search(r"max-age=(\d+)", resp.headers.get("Cache-Control", ""))
+    max_age = int(match.group(1)) if match else DEFAULT_MAX_AGE
+    return resp.json(), max_age
+
+
+class PublicKeyCache:
+    """Google signing keys, kept in memory until the endpoint's max-age runs out."""
+
+    def __init__(self, fetch: Callable[[], tuple[dict[str, str], int]] = fetch_google_certs,
+                 clock: Callable[[], float] = time.time):
+        self._fetch = fetch
+        self._clock = clock
+        self._keys: dict[str, RSA.RsaKey] = {}
+        self._expires_at = 0.0
+        self._fetched_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        certs, max_age = self._fetch()
+        now = self._clock()
+        self._keys = {kid: RSA.import_key(pem) for kid, pem in certs.items()}
+        self._fetched_at = now
+        self._expires_at = now + max_age
+
+    def get(self, kid: str) -> RSA.RsaKey:
+        with self._lock:
+            now = self._clock()
+            stale = now >= self._expires_at
+            # Keys rotate; an unknown kid may mean our copy is out of date
+            unknown = kid not in self._keys and now - self._fetched_at >= MIN_REFETCH_INTERVAL
+            if stale or unknown:
+                try:
+                    self._refresh()
+                except Exception as e:
+                    # Fall back to the keys we have and back off before retrying
+                    self._fetched_at = now
+                    self._expires_at = now + MIN_REFETCH_INTERVAL
+                    if kid not in self._keys:
+                        raise TokenError("Could not fetch signing keys") from e
+            try:
+                return self._keys[kid]
+            except KeyError:
+                raise TokenError(f"Unknown signing key: {kid}") from None
+
+
+google_keys = PublicKeyCache()
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def verify_id_token(token: str, project_id: str, keys: PublicKeyCache = google_keys,
+                    clock: Callable[[], float] = time.time) -> dict:
+    """Checks signature and claims of a Firebase ID token and returns the claims."""
+    try:
+        header_b64, payload_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64decode(header_b64))
+        claims = json.loads(_b64decode(payload_b64))
+        signature = _b64decode(signature_b64)
+    except ValueError as e:
+        raise TokenError("Malformed token") from e
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise TokenError("Malformed token")
+
+    if header.get("alg") != "RS256":
+        raise TokenError(f"Unexpected algorithm: {header.get('alg')}")
+    key = keys.get(header.get("kid", ""))
+    digest = SHA256.new(f"{header_b64}.{payload_b64}".encode())
+    try:
+        pkcs1_15.new(key).verify(digest, signature)
+    except ValueError:
+        raise TokenError("Invalid signature") from None
+
+    now = clock()
+    if claims.get("aud") != project_id:
+        raise TokenError("Wrong audience")
+    if claims.get("iss") != f"https://securetoken.google.com/{project_id}":
+        raise TokenError("Wrong issuer")
+    if not isinstance(claims.get("sub"), str) or not claims["sub"]:
+        raise TokenError("Missing subject")
+    if claims.get("exp", 0) <= now - CLOCK_SKEW:
+        raise TokenExpired("Token expired")
+    if claims.get("iat", float("inf")) > now + CLOCK_SKEW:
+        raise TokenError("Token issued in the future")
+    if claims.get("auth_time", 0) > now + CLOCK_SKEW:
+        raise TokenError("Authenticated in the future")
+    return claims
+
+
+class AuthSession:
+    """
+    Holds one signed-in user's tokens. Claims are verified once per ID token and
+    cached. A token close to expiry is refreshed on access; while the session is
+    in use a background timer does it ahead of time, and it stops re-arming once
+    the session has been idle for IDLE_TIMEOUT so abandoned sessions go quiet.
+    `refresh` is Pyrebase's `auth.refresh`, taking a refresh token and returning
+    {"userId", "idToken", "refreshToken"}.
+    """
+
+    def __init__(self, user: dict, project_id: str, refresh: Callable[[str], dict],
+                 keys: PublicKeyCache = google_keys, clock: Callable[[], float] = time.time):
+        self.project_id = project_id
+        self._user = dict(user)
+        self._refresh_fn = refresh
+        self._keys = keys
+        self._clock = clock
+        self._claims: dict | None = None
+        self._timer: threading.Timer | None = None
+        self._stopped = False
+        self._last_used = clock()
+        self._next_refresh_try = float("-inf")
+        self._lock = threading.RLock()
+
+    @property
+    def user(self) -> dict:
+        with self._lock:
+            return dict(self._user)
+
+    @property
+    def id_token(self) -> str:
+        with self._lock:
+            return self._user["idToken"]
+
+    def _verified_claims(self) -> dict:
+        with self._lock:
+            if self._claims is None:
+                self._claims = verify_id_token(self._user["idToken"], self.project_id,
+                                               self._keys, self._clock)
+            elif self._claims["exp"] <= self._clock() - CLOCK_SKEW:
+                raise TokenExpired("Token expired")
+            return self._claims
+
+    @property
+    def claims(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            self._last_used = now
+            try:
+                claims = self._verified_claims()
+            except TokenExpired:
+                claims = None
+            expiring = claims is None or claims["exp"] - now < REFRESH_MARGIN
+            if expiring and now >= self._next_refresh_try:
+                try:
+                    self.refresh()
+                    claims = self._verified_claims()
+                except Exception:
+                    self._next_refresh_try = now + RETRY_DELAY
+            if claims is None:
+                raise TokenExpired("Token expired and could not be refreshed")
+            self._ensure_timer()
+            return claims
+
+    def is_valid(self) -> bool:
+        try:
+            self.claims
+            return True
+        except TokenError:
+            return False
+
+    def refresh(self):
+        with self._lock:
+            refresh_token = self._user["refreshToken"]
+        resp = self._refresh_fn(refresh_token)
+        with self._lock:
+            self._user["idToken"] = resp["idToken"]
+            self._user["refreshToken"] = resp["refreshToken"]
+            self._claims = None
+        # Verify eagerly so the next page load doesn't pay for it
+        self._verified_claims()
+
+    def start(self):
+        """Verifies the sign-in token and starts background refreshes."""
+        self.claims
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    @property
+    def refreshing(self) -> bool:
+        with self._lock:
+            return self._timer is not None
+
+    def _ensure_timer(self):
+        with self._lock:
+            if self._timer is None and self._claims is not None:
+                self._schedule(max(self._claims["exp"] - REFRESH_MARGIN - self._clock(), 0))
+
+    def _schedule(self, delay: float):
+        with self._lock:
+            if self._stopped:
+                return
+            self._timer = threading.Timer(delay, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            if self._stopped or self._clock() - self._last_used > IDLE_TIMEOUT:
+                # Idle: the next access refreshes on demand and re-arms the timer
+                return
+        try:
+            self.refresh()
+        except Exception:
+            # Keep trying while the current token is still usable
+            try:
+                self._verified_claims()
+            except TokenError:
+                return
+            self._schedule(RETRY_DELAY)
+            return
+        self._ensure_timer()
@@ -0,0 +1,53 @@
+# Flood the rate limiter from several processes and check that the writes it
+# lets through stay within the global budget.
+# Usage: python bench_rate_limit.py [processes] [seconds]
+import multiprocessing as mp
+import random, sys, tempfile, time
+from pathlib import Path
+
+from rate_limit import GLOBAL_BURST, GLOBAL_RATE, USER_BURST, USER_RATE, RateLimiter
+
+PROCESSES = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+SECONDS = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+
+def flood(path: str, worker: int, deadline: float, results):
+    limiter = RateLimiter(Path(path))
+    rng = random.Random(worker)
+    allowed = attempts = spammer = 0
+    while time.time() < deadline:
+        # Half the traffic is one misbehaving client, the rest many ordinary ones
+        uid = "spammer" if rng.random() < 0.5 else f"user{rng.randrange(1000)}"
+        decision = limiter.acquire(uid, "post")
+        attempts += 1
+        allowed += decision.allowed
+        spammer += decision.allowed and uid == "spammer"
+    results.put((attempts, allowed, spammer))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "limits.db")
+        RateLimiter(Path(path))
+        results = mp.Queue()
+        deadline = time.time() + SECONDS
+        procs = [mp.Process(target=flood, args=(path, i, deadline, results)) for i in range(PROCESSES)]
+        for p in procs:
+            p.start()
+        totals = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        attempts, allowed, spammer = (sum(t[i] for t in totals) for i in range(3))
+        rejections = RateLimiter(Path(path)).rejections()
+
+    global_cap = GLOBAL_BURST + GLOBAL_RATE * SECONDS
+    user_cap = USER_BURST + USER_RATE * SECONDS
+    print(f"{PROCESSES} processes, {SECONDS:.0f}s: {attempts} attempts ({attempts / SECONDS:.0f}/s)")
+    print(f"allowed: {allowed} ({allowed / SECONDS:.1f}/s), global cap {global_cap:.0f}")
+    print(f"allowed for the spammer: {spammer}, per-user cap {user_cap:.0f}")
+    print("rejections:", rejections)
+    print("bounded:", allowed <= global_cap and spammer <= user_cap)
+
+
+if __name__ == "__main__":
+    main()
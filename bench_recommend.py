@@ -0,0 +1,68 @@
+# Vectorized TF-IDF scoring vs a pure-Python loop over the same vectors.
+# Usage: python bench_recommend.py [n_quotes]
+import hashlib, json, math, random, sys, time
+
+from recommend import QuoteRecommender
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+FAVORITES = 20
+K = 5
+
+
+def quote_id(quote: dict) -> str:
+    return hashlib.sha1((quote["author"] + "|" + quote["text"]).encode()).hexdigest()
+
+
+def synthetic_quotes(n: int) -> list[dict]:
+    with open("quotes.json", "r", encoding="utf-8") as f:
+        seed = json.load(f)
+    words = [w for q in seed for w in q["text"].split()]
+    rng = random.Random(0)
+    return [{"text": " ".join(rng.choices(words, k=rng.randint(8, 25))), "author": str(i)}
+            for i in range(n)]
+
+
+def python_recommend(rec: QuoteRecommender, favorite_ids: set[str], k: int) -> list[dict]:
+    # Same maths as QuoteRecommender.recommend, one dict-based dot product per quote
+    m = rec.matrix
+    rows = [{int(c): float(v) for c, v in zip(m.indices[m.indptr[i]:m.indptr[i + 1]],
+                                               m.data[m.indptr[i]:m.indptr[i + 1]])}
+            for i in range(m.shape[0])]
+    fav_rows = [rec.ids.index(qid) for qid in favorite_ids]
+    start = time.perf_counter()
+    centroid = {}
+    for i in fav_rows:
+        for c, v in rows[i].items():
+            centroid[c] = centroid.get(c, 0.0) + v / len(fav_rows)
+    norm = math.sqrt(sum(v * v for v in centroid.values())) or 1
+    scored = []
+    for i, row in enumerate(rows):
+        if i in fav_rows:
+            continue
+        scored.append((sum(v * centroid.get(c, 0.0) for c, v in row.items()) / norm, i))
+    scored.sort(reverse=True)
+    return [rec.quotes[i] for _, i in scored[:k]], time.perf_counter() - start
+
+
+def main():
+    quotes = synthetic_quotes(N)
+    start = time.perf_counter()
+    rec = QuoteRecommender(quotes, quote_id)
+    print(f"build: {N} quotes, {rec.matrix.shape[1]} n-grams, {time.perf_counter() - start:.2f}s")
+
+    favorites = set(random.Random(1).sample(rec.ids, FAVORITES))
+    rec.recommend(favorites, K)
+    runs = 20
+    start = time.perf_counter()
+    for _ in range(runs):
+        fast = rec.recommend(favorites, K)
+    fast_time = (time.perf_counter() - start) / runs
+    print(f"vectorized: {fast_time * 1000:.1f} ms")
+
+    slow, slow_time = python_recommend(rec, favorites, K)
+    print(f"pure Python: {slow_time * 1000:.1f} ms ({slow_time / fast_time:.0f}x slower)")
+    print("same top-k:", [q["author"] for q in fast] == [q["author"] for q in slow])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Converts a large generated CSV through tabular_preview in a fresh process and
+# reports peak memory, to check that previews stay bounded regardless of file size.
+# Usage: python bench_tabular_preview.py [size_mb] [limit_mb]
+import random, resource, subprocess, sys, tempfile, time
+from pathlib import Path
+
+SIZE_MB = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+LIMIT_MB = int(sys.argv[2]) if len(sys.argv) > 2 else 512
+
+CHILD = """
+import resource, sys, time
+from pathlib import Path
+import tabular_preview
+
+csv_path, cache_dir = Path(sys.argv[1]), Path(sys.argv[2])
+start = time.perf_counter()
+tabular_preview.convert(csv_path, cache_dir)
+converted = time.perf_counter() - start
+preview = tabular_preview.TabularPreview(csv_path, cache_dir)
+start = time.perf_counter()
+for offset in (0, preview.row_count // 2, preview.row_count - 100):
+    preview.window(offset, 100)
+    preview.window(offset, 100, ["id", "score"])
+windows = (time.perf_counter() - start) / 6
+print(preview.row_count, converted, windows, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def write_csv(path: Path, size: int):
+    rng = random.Random(0)
+    words = ["ազատություն", "ճնշում", "անհատ", "հասարակություն", "conformity", "dissent"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id,score,label,note\n")
+        i = 0
+        while f.tell() < size:
+            f.write("".join(f"{i + j},{rng.random():.6f},{rng.choice(words)},{' '.join(rng.choices(words, k=4))}\n"
+                            for j in range(10_000)))
+            i += 10_000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "big.csv"
+        write_csv(csv_path, SIZE_MB << 20)
+        size_mb = csv_path.stat().st_size >> 20
+        out = subprocess.run([sys.executable, "-c", CHILD, str(csv_path), str(Path(tmp) / "cache")],
+                             capture_output=True, text=True, check=True, cwd=Path(__file__).parent).stdout
+    rows, converted, window, max_rss_kb = out.split()
+    peak_mb = int(max_rss_kb) >> 10
+    print(f"{size_mb} MB CSV, {int(rows):,} rows: converted in {float(converted):.1f}s, "
+          f"window read {float(window) * 1000:.1f} ms")
+    print(f"peak RSS: {peak_mb} MB (limit {LIMIT_MB} MB)")
+    print("bounded:", peak_mb <= LIMIT_MB)
+
+
+if __name__ == "__main__":
+    main()
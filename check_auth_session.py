@@ -0,0 +1,115 @@
+# Exercises auth_session with locally signed tokens and a stubbed key endpoint.
+# Usage: python check_auth_session.py
+import base64, json, time
+
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+
+import auth_session
+from auth_session import AuthSession, PublicKeyCache, TokenError, verify_id_token
+
+PROJECT = "demo-project"
+KEY = RSA.generate(2048)
+
+
+def b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def sign(claims, kid="k1", header=None) -> str:
+    h = b64(json.dumps(header if header is not None else {"alg": "RS256", "kid": kid}).encode())
+    p = b64(json.dumps(claims).encode())
+    s = pkcs1_15.new(KEY).sign(SHA256.new(f"{h}.{p}".encode()))
+    return f"{h}.{p}.{b64(s)}"
+
+
+def claims_at(now: float, lifetime: float = 3600, **extra) -> dict:
+    return {"aud": PROJECT, "iss": f"https://securetoken.google.com/{PROJECT}", "sub": "uid1",
+            "iat": now, "auth_time": now, "exp": now + lifetime, **extra}
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def rejects(token: str, keys, clock) -> bool:
+    try:
+        verify_id_token(token, PROJECT, keys, clock)
+    except TokenError:
+        return True
+    return False
+
+
+def main():
+    clock = Clock(1_000_000.0)
+    fetches = []
+
+    def fetch():
+        fetches.append(clock())
+        return {"k1": KEY.publickey().export_key().decode()}, 100
+
+    keys = PublicKeyCache(fetch, clock)
+    good = claims_at(clock())
+
+    assert verify_id_token(sign(good), PROJECT, keys, clock)["sub"] == "uid1"
+    verify_id_token(sign(good), PROJECT, keys, clock)
+    assert len(fetches) == 1, "keys are cached"
+    clock.now += 101
+    verify_id_token(sign(claims_at(clock())), PROJECT, keys, clock)
+    assert len(fetches) == 2, "keys are refetched after max-age"
+
+    assert rejects(sign(dict(good, aud="other")), keys, clock)
+    assert rejects(sign(dict(good, iss="https://evil")), keys, clock)
+    assert rejects(sign(good)[:-4] + "AAAA", keys, clock)
+    assert rejects(sign([1, 2]), keys, clock)
+    assert rejects(sign(good, header=["RS256"]), keys, clock)
+    assert rejects(sign(good, kid="unknown"), keys, clock)
+    assert rejects("not-a-token", keys, clock)
+    assert rejects(sign(claims_at(clock() - 7200)), keys, clock)
+    print("verify_id_token: ok")
+
+    # An expired token is refreshed on access
+    refreshes = []
+
+    def refresh(token):
+        refreshes.append(token)
+        return {"idToken": sign(claims_at(clock())), "refreshToken": f"r{len(refreshes)}"}
+
+    session = AuthSession({"idToken": sign(claims_at(clock())), "refreshToken": "r0"},
+                          PROJECT, refresh, keys, clock)
+    assert session.is_valid() and not refreshes
+    clock.now += 3700
+    assert session.is_valid() and refreshes == ["r0"]
+    assert session.user["refreshToken"] == "r1"
+
+    # Once idle, the background timer stops re-arming itself
+    session._on_timer()
+    assert session.refreshing and len(refreshes) == 2, "active sessions prefetch"
+    clock.now += auth_session.IDLE_TIMEOUT + 1
+    session._on_timer()
+    assert not session.refreshing and len(refreshes) == 2, "idle sessions go quiet"
+    session.is_valid()
+    assert session.refreshing, "use re-arms the timer"
+    session.stop()
+    print("AuthSession refresh: ok")
+
+    # Real timer: a started session refreshes ahead of expiry in the background
+    real_keys = PublicKeyCache(lambda: ({"k1": KEY.publickey().export_key().decode()}, 100))
+    lifetime = auth_session.REFRESH_MARGIN + 0.3
+    session = AuthSession({"idToken": sign(claims_at(time.time(), lifetime)), "refreshToken": "r0"},
+                          PROJECT, lambda t: {"idToken": sign(claims_at(time.time())), "refreshToken": "r1"},
+                          real_keys)
+    session.start()
+    time.sleep(1)
+    assert session.user["refreshToken"] == "r1"
+    session.stop()
+    print("background refresh: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# Crash recovery, failure isolation and outage handling for write_journal.
+# Usage: python check_write_journal.py [n_writes]
+import subprocess, sys, tempfile
+from pathlib import Path
+
+import write_journal
+from write_journal import PermanentWriteError, WriteJournal
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+# Journals N writes and dies without flushing or closing anything
+CRASHING_WRITER = """
+import os, sys
+from write_journal import WriteJournal
+
+def unreachable(entries):
+    raise ConnectionError("backend down")
+
+journal = WriteJournal(unreachable, sys.argv[1])
+keys = [journal.enqueue("post", str(i), {"i": i}) for i in range(int(sys.argv[2]))]
+journal.flush()
+print("\\n".join(keys), flush=True)
+os._exit(1)
+"""
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def drain(journal: WriteJournal, clock: Clock, rounds: int = 100):
+    for _ in range(rounds):
+        while journal.flush():
+            pass
+        clock.now += write_journal.MAX_BACKOFF + write_journal.LEASE_SECONDS
+
+
+def check_crash_recovery(tmp: Path):
+    path = tmp / "crash.db"
+    out = subprocess.run([sys.executable, "-c", CRASHING_WRITER, str(path), str(N)],
+                         capture_output=True, text=True, cwd=Path(__file__).parent)
+    assert out.returncode == 1, out.stderr
+    journaled = set(out.stdout.split())
+    assert len(journaled) == N
+
+    delivered = []
+    failures = [3]
+
+    def flaky(entries):
+        if failures[0]:
+            failures[0] -= 1
+            raise ConnectionError("still flaky")
+        delivered.extend(e.key for e in entries)
+
+    clock = Clock()
+    clock.now = 10 ** 10     # well past the crashed worker's lease
+    journal = WriteJournal(flaky, path, clock)
+    assert {e.key for e in journal.pending("post")} == journaled
+    drain(journal, clock)
+    assert set(delivered) == journaled, f"lost {len(journaled - set(delivered))} writes"
+    assert not journal.pending("post")
+    print(f"crash recovery: {N}/{N} journaled writes delivered")
+
+
+def check_isolation(tmp: Path):
+    delivered = []
+
+    def backend(entries):
+        if any(e.payload.get("poison") for e in entries):
+            raise PermanentWriteError("document too large")
+        delivered.extend(e.key for e in entries)
+
+    clock = Clock()
+    journal = WriteJournal(backend, tmp / "isolation.db", clock)
+    innocent = [journal.enqueue("post", str(i), {"i": i}, owner="alice") for i in range(5)]
+    poison = journal.enqueue("post", "big", {"poison": True}, owner="bob")
+    innocent += [journal.enqueue("reply", "1", {"i": i}, owner="alice") for i in range(5)]
+
+    assert journal.flush() == len(innocent)
+    assert delivered == innocent, "innocent entries go out in the same flush"
+    assert [e.key for e, _ in journal.dead_letters("bob")] == [poison]
+    assert not journal.dead_letters("alice"), "dead letters are reported to their owner only"
+    assert not journal.pending("post") and not journal.failing("bob")
+    journal.dismiss_dead([poison])
+    assert not journal.dead_letters("bob")
+    print("failure isolation: ok")
+
+
+def check_outage(tmp: Path):
+    calls = []
+    down = [True]
+
+    def backend(entries):
+        calls.append(len(entries))
+        if down[0]:
+            raise ConnectionError("unavailable")
+
+    clock = Clock()
+    journal = WriteJournal(backend, tmp / "outage.db", clock)
+    keys = [journal.enqueue("post", str(i), {"i": i}, owner="alice") for i in range(50)]
+
+    # A long outage: one RPC per flush, nothing is given up on
+    for _ in range(40):
+        journal.flush()
+        clock.now += write_journal.MAX_BACKOFF + write_journal.LEASE_SECONDS
+    assert calls == [50] * 40, "the whole batch backs off instead of being split"
+    assert journal.failing("alice") == 50 and not journal.failing("bob")
+    assert len(journal.pending("post")) == 50 and not journal.dead_letters()
+
+    down[0] = False
+    calls.clear()
+    assert journal.flush() == 50 and calls == [50], "retried entries are batched again"
+    assert not journal.pending("post") and not journal.failing("alice")
+    print(f"outage: {len(keys)} writes held through 40 failed flushes, then sent in one batch")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_crash_recovery(Path(tmp))
+        check_isolation(Path(tmp))
+        check_outage(Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import hashlib, re, sys, threading
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import quote
+
+from PIL import Image, ImageOps
+
+# Served by Streamlit under app/static/ (server.enableStaticServing)
+STATIC_DIR = Path("static/img")
+STATIC_URL = "app/static/img"
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 6}),
+           "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True})}
+DEVICE_PIXEL_RATIO = 2      # size variants for high-density screens
+PIPELINE_VERSION = b"2"     # part of the file hash; bump when variant output changes
+
+
+@dataclass(frozen=True)
+class Variant:
+    path: Path
+    width: int
+    fmt: str
+    digest: str
+
+    @property
+    def url(self) -> str:
+        # Tornado's StaticFileHandler sends a ten-year max-age for URLs carrying `v`
+        return f"{STATIC_URL}/{quote(self.path.name)}?v={self.digest}"
+
+
+_variants: dict[tuple[str, int], list[Variant]] = {}
+_lock = threading.Lock()
+
+
+def _content_hash(src: Path) -> str:
+    h = hashlib.sha1(PIPELINE_VERSION)
+    with open(src, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()[:12]
+
+
+def _has_alpha(im: Image.Image) -> bool:
+    return im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info)
+
+
+def _on_white(im: Image.Image) -> Image.Image:
+    # JPEG has no alpha channel; flatten onto the page colour rather than black
+    if im.mode != "RGBA":
+        return im
+    background = Image.new("RGBA", im.size, (255, 255, 255, 255))
+    return Image.alpha_composite(background, im).convert("RGB")
+
+
+def _prefix(src: Path) -> str:
+    # Keep the extension so photo.png and photo.jpg don't share variants
+    return f"{src.stem}_{src.suffix.lstrip('.').lower()}"
+
+
+def _prune(src: Path, digest: str, out_dir: Path):
+    """Removes variants of `src` left by an older file version or pipeline version."""
+    pattern = re.compile(re.escape(_prefix(src)) + r"-([0-9a-f]{12})-\d+w\.(webp|jpg)")
+    # Names from before the extension was part of the prefix are always stale
+    legacy = re.compile(re.escape(src.stem) + r"-[0-9a-f]{12}-\d+w\.(webp|jpg)")
+    for path in out_dir.iterdir():
+        match = pattern.fullmatch(path.name)
+        if (match and match.group(1) != digest) or legacy.fullmatch(path.name):
+            path.unlink(missing_ok=True)
+
+
+def build_variants(src: Path, out_dir: Path = STATIC_DIR) -> list[Variant]:
+    """Writes resized WebP/JPEG copies of `src`; names carry the content hash so they never go stale."""
+    src = Path(src)
+    digest = _content_hash(src)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with Image.open(src) as im:
+        im = ImageOps.exif_transpose(im)
+        im = im.convert("RGBA" if _has_alpha(im) else "RGB")
+        widths = [w for w in VARIANT_WIDTHS if w < im.width] + [min(im.width, VARIANT_WIDTHS[-1])]
+        variants = []
+        for width in sorted(set(widths)):
+            resized = None
+            for ext, (fmt, options) in FORMATS.items():
+                path = out_dir / f"{_prefix(src)}-{digest}-{width}w.{ext}"
+                if not path.exists():
+                    if resized is None:
+                        height = round(im.height * width / im.width)
+                        resized = im.resize((width, height), Image.LANCZOS)
+                    tmp = path.with_name(path.name + ".tmp")
+                    (resized if fmt == "WEBP" else _on_white(resized)).save(tmp, fmt, **options)
+                    tmp.replace(path)
+                variants.append(Variant(path, width, ext, digest))
+    _prune(src, digest, out_dir)
+    return variants
+
+
+def get_variants(src: Path) -> list[Variant]:
+    src = Path(src)
+    key = (str(src.resolve()), src.stat().st_mtime_ns)
+    with _lock:
+        if key not in _variants:
+            _variants[key] = build_variants(src)
+        return _variants[key]
+
+
+def pick_variant(src: Path, display_width: int, fmt: str = "webp") -> Variant:
+    """Smallest variant that still covers `display_width` CSS pixels on a high-density screen."""
+    candidates = [v for v in get_variants(src) if v.fmt == fmt]
+    needed = display_width * DEVICE_PIXEL_RATIO
+    return next((v for v in candidates if v.width >= needed), candidates[-1])
+
+
+def image_html(src: Path, display_width: int, alt: str = "") -> str:
+    variants = get_variants(src)
+    srcset = {fmt: ", ".join(f"{v.url} {v.width}w" for v in variants if v.fmt == fmt) for fmt in FORMATS}
+    fallback = pick_variant(src, display_width, "jpg")
+    alt = alt.replace('"', "&quot;")
+    return f"""
+    <picture>
+        <source type="image/webp" srcset="{srcset['webp']}" sizes="{display_width}px">
+        <img src="{fallback.url}" srcset="{srcset['jpg']}" sizes="{display_width}px"
+             width="{display_width}" alt="{alt}" loading="lazy" style="max-width:100%; height:auto;">
+    </picture>
+    """
+
+
+if __name__ == "__main__":
+    # Build step: python image_assets.py [dir ...]
+    for folder in sys.argv[1:] or ["resources"]:
+        for path in sorted(Path(folder).iterdir()):
+            if path.suffix.lower() in {".png", ".jpg", ".jpeg"}:
+                for v in build_variants(path):
+                    print(f"{path.name} → {v.path}")
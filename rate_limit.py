@@ -0,0 +1,118 @@
+import sqlite3, threading, time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+LIMITS_PATH = Path(".cache/ratelimit.db")
+USER_RATE, USER_BURST = 0.5, 10         # per uid: a write every 2s, bursts of 10
+GLOBAL_RATE, GLOBAL_BURST = 20.0, 40    # all users together, per second
+BUSY_TIMEOUT = 0.25                     # seconds to wait for the store before rejecting
+BUSY_RETRY_AFTER = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key     TEXT PRIMARY KEY,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rejections (
+    scope  TEXT NOT NULL,
+    action TEXT NOT NULL,
+    count  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, action)
+);
+"""
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    retry_after: float = 0.0
+    scope: str | None = None     # "user", "global" or "busy" when rejected
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by uid plus one global bucket, kept in SQLite so every
+    worker process on the host draws from the same budget. A request needs a
+    token from both buckets; rejected requests are counted per scope and action.
+    If the store stays locked for BUSY_TIMEOUT the request is rejected with scope
+    "busy" rather than blocking the page.
+    """
+
+    def __init__(self, path: Path = LIMITS_PATH,
+                 user_rate: float = USER_RATE, user_burst: float = USER_BURST,
+                 global_rate: float = GLOBAL_RATE, global_burst: float = GLOBAL_BURST,
+                 clock: Callable[[], float] = time.time):
+        self._path = Path(path)
+        self._limits = {"user": (user_rate, user_burst), "global": (global_rate, global_burst)}
+        self._clock = clock
+        self._busy: dict[str, int] = {}     # can't be written to the store while it's locked
+        self._busy_lock = threading.Lock()
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        # Buckets are cheap to lose on a power cut; don't fsync every request
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _level(self, conn: sqlite3.Connection, key: str, scope: str, now: float) -> float:
+        rate, burst = self._limits[scope]
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return burst
+        tokens, updated = row
+        return min(burst, tokens + max(now - updated, 0) * rate)
+
+    def acquire(self, uid: str, action: str = "write") -> Decision:
+        try:
+            return self._acquire(uid, action)
+        except sqlite3.Error:
+            with self._busy_lock:
+                self._busy[action] = self._busy.get(action, 0) + 1
+            return Decision(False, BUSY_RETRY_AFTER, "busy")
+
+    def _acquire(self, uid: str, action: str) -> Decision:
+        buckets = {"user": f"user:{uid}", "global": "global"}
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            now = self._clock()
+            levels = {scope: self._level(conn, key, scope, now) for scope, key in buckets.items()}
+            short = [scope for scope, tokens in levels.items() if tokens < 1]
+            if short:
+                # Report the scope that frees up last
+                scope = max(short, key=lambda s: (1 - levels[s]) / self._limits[s][0])
+                conn.execute("INSERT INTO rejections (scope, action, count) VALUES (?, ?, 1)"
+                             " ON CONFLICT (scope, action) DO UPDATE SET count = count + 1",
+                             (scope, action))
+                conn.execute("COMMIT")
+                return Decision(False, (1 - levels[scope]) / self._limits[scope][0], scope)
+            conn.executemany("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                             [(key, levels[scope] - 1, now) for scope, key in buckets.items()])
+            conn.execute("COMMIT")
+            return Decision(True)
+
+    def rejections(self) -> dict[tuple[str, str], int]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT scope, action, count FROM rejections").fetchall()
+        counts = {(scope, action): count for scope, action, count in rows}
+        with self._busy_lock:
+            counts.update((("busy", action), n) for action, n in self._busy.items())
+        return counts
+
+
+_limiter: RateLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
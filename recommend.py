@@ -0,0 +1,91 @@
+import json, threading
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import scipy.sparse as sp
+
+NGRAM_RANGE = (2, 4)
+
+
+def word_ngrams(word: str, ngram_range: tuple[int, int] = NGRAM_RANGE) -> list[str]:
+    # Character n-grams within word boundaries; needs no Armenian tokenizer or stemmer
+    lo, hi = ngram_range
+    word = f" {word} "
+    return [word[i:i + n] for n in range(lo, hi + 1) for i in range(len(word) - n + 1)]
+
+
+def tfidf_matrix(texts: list[str]) -> tuple[sp.csr_matrix, dict[str, int]]:
+    """L2-normalised TF-IDF rows over character n-grams, one row per text."""
+    vocab: dict[str, int] = {}
+    word_cache: dict[str, list[int]] = {}   # words repeat far more than texts do
+    indptr, indices = [0], []
+    for text in texts:
+        for word in text.lower().split():
+            ids = word_cache.get(word)
+            if ids is None:
+                ids = word_cache[word] = [vocab.setdefault(g, len(vocab)) for g in word_ngrams(word)]
+            indices.extend(ids)
+        indptr.append(len(indices))
+    counts = sp.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                           shape=(len(texts), len(vocab)))
+    counts.sum_duplicates()
+
+    df = np.bincount(counts.indices, minlength=len(vocab))
+    idf = np.log((1 + len(texts)) / (1 + df)).astype(np.float32) + 1
+    tfidf = counts.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sp.diags(1 / norms).dot(tfidf).tocsr(), vocab
+
+
+class QuoteRecommender:
+    def __init__(self, quotes: list[dict], key: Callable[[dict], str]):
+        self.quotes = quotes
+        self.ids = [key(q) for q in quotes]
+        self._row = {qid: i for i, qid in enumerate(self.ids)}
+        self.matrix, self.vocab = tfidf_matrix([q["text"] for q in quotes])
+
+    def scores(self, favorite_ids: set[str]) -> np.ndarray:
+        """Cosine similarity of every quote to the centroid of the favorites."""
+        rows = [self._row[qid] for qid in favorite_ids if qid in self._row]
+        if not rows:
+            return np.zeros(len(self.ids), dtype=np.float32)
+        centroid = np.asarray(self.matrix[rows].mean(axis=0)).ravel()
+        centroid /= np.linalg.norm(centroid) or 1
+        scores = self.matrix.dot(centroid)
+        scores[rows] = -np.inf
+        return scores
+
+    def recommend(self, favorite_ids: set[str], k: int = 5) -> list[dict]:
+        scores = self.scores(favorite_ids)
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.quotes[i] for i in top if scores[i] > 0]
+
+
+_recommenders: dict[tuple[str, int], QuoteRecommender] = {}
+_lock = threading.Lock()
+
+
+def get_recommender(json_path: str, key: Callable[[dict], str]) -> QuoteRecommender:
+    """Builds the TF-IDF matrix once per process and again only when the file changes."""
+    path = Path(json_path)
+    try:
+        cache_key = (str(path.resolve()), path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        # Same fallback as GetQuotes: no quotes file, nothing to recommend
+        return QuoteRecommender([], key)
+    with _lock:
+        if cache_key not in _recommenders:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    quotes = json.load(f)
+            except FileNotFoundError:
+                return QuoteRecommender([], key)
+            _recommenders.clear()
+            _recommenders[cache_key] = QuoteRecommender(quotes, key)
+        return _recommenders[cache_key]
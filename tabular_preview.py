@@ -0,0 +1,227 @@
+import hashlib, json, threading
+from collections import OrderedDict
+from itertools import islice
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as ipc
+
+CACHE_DIR = Path(".cache/tabular")
+CSV_BLOCK_SIZE = 4 << 20   # bytes of CSV parsed per record batch
+EXCEL_CHUNK_ROWS = 50_000
+
+
+def _cache_key(path: Path) -> str:
+    # "<source>-<version>": the source part identifies the file, the version part
+    # its size + mtime, so an edited file gets re-converted without hashing the
+    # whole thing on every rerun, and older versions can be found and removed
+    st = path.stat()
+    source = hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:16]
+    version = hashlib.sha1(f"{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest()[:16]
+    return f"{source}-{version}"
+
+
+def _remove_stale(cache_dir: Path, key: str):
+    source = key.split("-")[0]
+    for stale in cache_dir.glob(f"{source}-*"):
+        if not stale.name.startswith(key):
+            # Open previews keep their memory map; the file just loses its name
+            stale.unlink(missing_ok=True)
+
+
+# Readers are generators that yield the schema first and then record batches.
+# With `strings=True` every column is read as text, which always succeeds and is
+# the fallback when type inference from the first block turns out to be wrong.
+
+def _csv_batches(path: Path, strings: bool = False):
+    read_options = pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE)
+    convert_options = None
+    if strings:
+        names = pa_csv.open_csv(path, read_options=read_options).schema.names
+        convert_options = pa_csv.ConvertOptions(column_types={n: pa.string() for n in names})
+    reader = pa_csv.open_csv(path, read_options=read_options, convert_options=convert_options)
+    yield reader.schema
+    yield from reader
+
+
+def _text(value):
+    return None if value is None or (isinstance(value, float) and value != value) else str(value)
+
+
+def _frame_to_table(df: pd.DataFrame, schema: pa.Schema | None, strings: bool) -> pa.Table:
+    if strings:
+        return pa.table({c: pa.array([_text(v) for v in df[c]], pa.string()) for c in df.columns})
+    for c in df.columns:
+        # Excel columns often mix numbers and text, which Arrow can't hold in one column
+        if df[c].dtype == object and len({type(v) for v in df[c] if v is not None}) > 1:
+            df[c] = df[c].map(_text)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def _xlsx_batches(path: Path, strings: bool = False):
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h) if h is not None else f"column_{i}" for i, h in enumerate(next(rows, ()))]
+        schema = None
+        while True:
+            chunk = list(islice(rows, EXCEL_CHUNK_ROWS))
+            if not chunk:
+                break
+            df = pd.DataFrame.from_records(chunk, columns=header)
+            # Later chunks must fit the types inferred from the first one
+            table = _frame_to_table(df, schema, strings)
+            if schema is None:
+                schema = table.schema
+                yield schema
+            yield from table.to_batches()
+        if schema is None:
+            yield pa.schema([(h, pa.string()) for h in header])
+    finally:
+        wb.close()
+
+
+def _xls_batches(path: Path, strings: bool = False):
+    # Legacy .xls has no streaming reader; it is read once here and never again
+    df = pd.read_excel(path, dtype=str if strings else None)
+    table = _frame_to_table(df, None, strings)
+    yield table.schema
+    yield from table.to_batches()
+
+
+READERS = {".csv": _csv_batches, ".xlsx": _xlsx_batches, ".xls": _xls_batches}
+
+
+class _StatsAccumulator:
+    def __init__(self, schema: pa.Schema):
+        self.rows = 0
+        self.columns = {f.name: {"type": str(f.type), "nulls": 0, "min": None, "max": None,
+                                 "_sum": 0.0, "_count": 0} for f in schema}
+        self.numeric = {f.name for f in schema
+                        if pa.types.is_integer(f.type) or pa.types.is_floating(f.type)}
+
+    def update(self, batch: pa.RecordBatch):
+        self.rows += batch.num_rows
+        for name, column in zip(batch.schema.names, batch.columns):
+            stats = self.columns[name]
+            stats["nulls"] += column.null_count
+            if name not in self.numeric or column.null_count == len(column):
+                continue
+            mm = pc.min_max(column)
+            lo, hi = mm["min"].as_py(), mm["max"].as_py()
+            stats["min"] = lo if stats["min"] is None else min(stats["min"], lo)
+            stats["max"] = hi if stats["max"] is None else max(stats["max"], hi)
+            stats["_sum"] += pc.sum(column).as_py()
+            stats["_count"] += len(column) - column.null_count
+
+    def result(self) -> dict:
+        columns = {}
+        for name, stats in self.columns.items():
+            out = {k: v for k, v in stats.items() if not k.startswith("_")}
+            if name in self.numeric and stats["_count"]:
+                out["mean"] = stats["_sum"] / stats["_count"]
+            columns[name] = out
+        return {"rows": self.rows, "columns": columns}
+
+
+def convert(path: Path, cache_dir: Path = CACHE_DIR) -> tuple[Path, Path]:
+    """Streams a CSV/XLSX file into an Arrow IPC file plus a JSON stats sidecar."""
+    path = Path(path)
+    reader = READERS.get(path.suffix.lower())
+    if reader is None:
+        raise ValueError(f"Unsupported file type: {path.suffix}")
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    key = _cache_key(path)
+    arrow_path = cache_dir / f"{key}.arrow"
+    meta_path = cache_dir / f"{key}.json"
+    if arrow_path.exists() and meta_path.exists():
+        return arrow_path, meta_path
+
+    tmp_path = arrow_path.with_suffix(".arrow.tmp")
+    try:
+        try:
+            stats = _write_arrow(reader(path), tmp_path)
+        except pa.ArrowInvalid:
+            stats = _write_arrow(reader(path, strings=True), tmp_path)
+        meta_path.write_text(json.dumps(stats, ensure_ascii=False, default=str), encoding="utf-8")
+        tmp_path.replace(arrow_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    _remove_stale(cache_dir, key)
+    return arrow_path, meta_path
+
+
+def _write_arrow(batches, tmp_path: Path) -> dict:
+    try:
+        schema = next(batches)
+        stats = _StatsAccumulator(schema)
+        with pa.OSFile(str(tmp_path), "wb") as sink, ipc.new_file(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                stats.update(batch)
+        return stats.result()
+    finally:
+        batches.close()
+
+
+class TabularPreview:
+    """Memory-mapped view over a converted file; only requested windows are materialised."""
+
+    def __init__(self, path: Path, cache_dir: Path = CACHE_DIR):
+        arrow_path, meta_path = convert(path, cache_dir)
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        self.row_count: int = meta["rows"]
+        self.stats: dict[str, dict] = meta["columns"]
+        self._source = pa.memory_map(str(arrow_path), "r")
+        self._table = ipc.open_file(self._source).read_all()   # zero-copy over the map
+
+    @property
+    def columns(self) -> list[str]:
+        return self._table.column_names
+
+    def window(self, start: int = 0, length: int = 100, columns: list[str] | None = None) -> pd.DataFrame:
+        table = self._table.slice(max(start, 0), max(length, 0))
+        if columns is not None:
+            table = table.select(columns)
+        df = table.to_pandas()
+        df.index = range(max(start, 0), max(start, 0) + len(df))
+        return df
+
+    def stats_frame(self) -> pd.DataFrame:
+        return pd.DataFrame.from_dict(self.stats, orient="index")
+
+
+MAX_OPEN_PREVIEWS = 8
+_open_previews: "OrderedDict[str, tuple[str, TabularPreview]]" = OrderedDict()
+_open_lock = threading.Lock()                       # guards the two dicts only
+_path_locks: dict[str, threading.Lock] = {}
+
+
+def open_preview(path: Path) -> TabularPreview:
+    """Returns a process-wide shared preview, converting the file on first use."""
+    path = Path(path)
+    name, key = str(path.resolve()), _cache_key(path)
+    with _open_lock:
+        cached = _open_previews.get(name)
+        if cached is not None and cached[0] == key:
+            _open_previews.move_to_end(name)
+            return cached[1]
+        path_lock = _path_locks.setdefault(name, threading.Lock())
+
+    # Conversion can take minutes; only sessions opening this same file wait for it
+    with path_lock:
+        with _open_lock:
+            cached = _open_previews.get(name)
+        if cached is None or cached[0] != key:
+            cached = (key, TabularPreview(path))
+        with _open_lock:
+            # A changed file replaces its old version; least recently used ones go first
+            _open_previews[name] = cached
+            _open_previews.move_to_end(name)
+            while len(_open_previews) > MAX_OPEN_PREVIEWS:
+                _open_previews.popitem(last=False)
+        return cached[1]
@@ -0,0 +1,236 @@
+import json, sqlite3, threading, time, uuid
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+JOURNAL_PATH = Path(".cache/journal.db")
+BATCH_SIZE = 100            # Firestore batches take up to 500 operations
+POLL_INTERVAL = 0.5
+LEASE_SECONDS = 30          # how long a worker owns a batch before others may retry it
+MAX_BACKOFF = 300
+KEEP_DONE_SECONDS = 24 * 3600
+
+# Values of writes.done; DISMISSED is a dead letter its owner has been told about
+PENDING, DONE, DEAD, DISMISSED = 0, 1, 2, 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS writes (
+    key          TEXT PRIMARY KEY,
+    kind         TEXT NOT NULL,
+    target       TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    created      REAL NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    lease_until  REAL NOT NULL DEFAULT 0,
+    last_error   TEXT,
+    done         INTEGER NOT NULL DEFAULT 0,
+    owner        TEXT
+);
+CREATE INDEX IF NOT EXISTS writes_pending ON writes (done, next_attempt, created);
+"""
+
+
+class PermanentWriteError(Exception):
+    """
+    Raised by `commit` when the backend rejected an entry rather than being
+    unreachable. For a batch this means "some entry here is bad"; for a single
+    entry it means that entry will never be accepted.
+    """
+
+
+@dataclass(frozen=True)
+class Entry:
+    key: str            # idempotency key, stable across retries
+    kind: str
+    target: str
+    payload: dict
+
+
+class WriteJournal:
+    """
+    Durable write-behind queue. `enqueue` returns once the write is on disk;
+    a background worker hands batches of entries to `commit` and retries with
+    backoff until it succeeds. `commit` must be idempotent per entry key, since
+    a crash between committing and marking done replays the batch.
+
+    Any other error is taken as the backend being unavailable: the whole batch
+    backs off and is retried, batched again, indefinitely. A batch rejected with
+    PermanentWriteError is split so the bad entry can't hold back the others;
+    an entry rejected on its own is dead-lettered, kept on disk for its owner
+    to be told about but no longer pending.
+    """
+
+    def __init__(self, commit: Callable[[list[Entry]], None], path: Path = JOURNAL_PATH,
+                 clock: Callable[[], float] = time.time):
+        self._commit = commit
+        self._path = Path(path)
+        self._clock = clock
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(writes)")}
+            if "owner" not in columns:     # journals created before writes had owners
+                conn.execute("ALTER TABLE writes ADD COLUMN owner TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def enqueue(self, kind: str, target: str, payload: dict, supersede: bool = False,
+                owner: str | None = None) -> str:
+        """
+        Journals a write on behalf of `owner` (a uid). With `supersede`, older
+        pending writes to the same target are dropped.
+        """
+        key = uuid.uuid4().hex
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if supersede:
+                conn.execute("DELETE FROM writes WHERE kind = ? AND target = ? AND done = 0",
+                             (kind, target))
+            conn.execute("INSERT INTO writes (key, kind, target, payload, created, owner)"
+                         " VALUES (?, ?, ?, ?, ?, ?)",
+                         (key, kind, target, json.dumps(payload, ensure_ascii=False), self._clock(), owner))
+            conn.execute("COMMIT")
+        self._wake.set()
+        return key
+
+    def pending(self, kind: str, target: str | None = None) -> list[Entry]:
+        """Writes not yet confirmed by the backend, oldest first."""
+        query = "SELECT key, kind, target, payload FROM writes WHERE done = 0 AND kind = ?"
+        args = [kind]
+        if target is not None:
+            query += " AND target = ?"
+            args.append(target)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query + " ORDER BY created", args).fetchall()
+        return [Entry(k, kd, t, json.loads(p)) for k, kd, t, p in rows]
+
+    def failing(self, owner: str) -> int:
+        """How many of `owner`'s writes are being retried."""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM writes WHERE done = ? AND attempts > 0 AND owner = ?",
+                                (PENDING, owner)).fetchone()[0]
+
+    def dead_letters(self, owner: str | None = None) -> list[tuple[Entry, str]]:
+        """Writes that were rejected and not yet dismissed, with the last error for each."""
+        query = "SELECT key, kind, target, payload, last_error FROM writes WHERE done = ?"
+        args: list = [DEAD]
+        if owner is not None:
+            query += " AND owner = ?"
+            args.append(owner)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query + " ORDER BY created", args).fetchall()
+        return [(Entry(k, kd, t, json.loads(p)), err) for k, kd, t, p, err in rows]
+
+    def dismiss_dead(self, keys: list[str]):
+        with closing(self._connect()) as conn:
+            conn.executemany("UPDATE writes SET done = ? WHERE key = ? AND done = ?",
+                             [(DISMISSED, key, DEAD) for key in keys])
+
+    def requeue_dead(self) -> int:
+        with closing(self._connect()) as conn:
+            cur = conn.execute("UPDATE writes SET done = ?, attempts = 0, next_attempt = 0"
+                               " WHERE done IN (?, ?)", (PENDING, DEAD, DISMISSED))
+        self._wake.set()
+        return cur.rowcount
+
+    def _claim(self, conn: sqlite3.Connection) -> list[tuple[Entry, int]]:
+        now = self._clock()
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT key, kind, target, payload, attempts FROM writes"
+            " WHERE done = 0 AND next_attempt <= ? AND lease_until <= ?"
+            " ORDER BY created LIMIT ?", (now, now, BATCH_SIZE)).fetchall()
+        conn.executemany("UPDATE writes SET lease_until = ? WHERE key = ?",
+                         [(now + LEASE_SECONDS, r[0]) for r in rows])
+        conn.execute("COMMIT")
+        return [(Entry(k, kd, t, json.loads(p)), attempts) for k, kd, t, p, attempts in rows]
+
+    def _send(self, entries: list[Entry]) -> dict[str, Exception | None]:
+        try:
+            self._commit(entries)
+            return {e.key: None for e in entries}
+        except PermanentWriteError as err:
+            if len(entries) == 1:
+                return {entries[0].key: err}
+        except Exception as err:
+            # Backend unreachable: back off the whole batch rather than retrying
+            # each entry against it
+            return {e.key: err for e in entries}
+        # Some entry in the batch was rejected; find it without holding back the rest
+        results: dict[str, Exception | None] = {}
+        for e in entries:
+            results.update(self._send([e]))
+        return results
+
+    def flush(self) -> int:
+        """Sends one batch of due writes; returns how many were committed."""
+        with closing(self._connect()) as conn:
+            claimed = self._claim(conn)
+            if not claimed:
+                return 0
+            results = self._send([e for e, _ in claimed])
+            attempts = {e.key: a for e, a in claimed}
+
+            now = self._clock()
+            conn.execute("BEGIN IMMEDIATE")
+            for key, err in results.items():
+                if err is None:
+                    conn.execute("UPDATE writes SET done = ?, lease_until = 0, last_error = NULL"
+                                 " WHERE key = ?", (DONE, key))
+                elif isinstance(err, PermanentWriteError):
+                    conn.execute("UPDATE writes SET done = ?, attempts = attempts + 1, lease_until = 0,"
+                                 " last_error = ? WHERE key = ?", (DEAD, repr(err), key))
+                else:
+                    delay = min(2 ** attempts[key], MAX_BACKOFF)
+                    conn.execute("UPDATE writes SET attempts = attempts + 1, next_attempt = ?,"
+                                 " lease_until = 0, last_error = ? WHERE key = ?",
+                                 (now + delay, repr(err), key))
+            conn.execute("DELETE FROM writes WHERE done = ? AND created < ?",
+                         (DONE, now - KEEP_DONE_SECONDS))
+            conn.execute("COMMIT")
+            return sum(err is None for err in results.values())
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.flush()
+            except sqlite3.Error:
+                sent = 0
+            if not sent:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="write-journal", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+_journal: WriteJournal | None = None
+_journal_lock = threading.Lock()
+
+
+def get_journal(commit: Callable[[list[Entry]], None]) -> WriteJournal:
+    """Process-wide journal with its worker running; `commit` is only used on first call."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = WriteJournal(commit)
+            _journal.start()
+        return _journal